@@ -1,5 +1,169 @@
+import contextlib
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 
+# 解析结果的磁盘缓存目录
+CACHE_DIR = '.xlsxcache'
+# 缓存格式版本，解析逻辑或返回结构变化时需要递增，使旧缓存失效
+CACHE_VERSION = 4
+
+# 配置文件中每行必须填写的关键列
+CONFIG_KEY_COLUMNS = ('LeftTitle', 'RightTitle', 'TransType')
+
+# 优先使用基于 Rust 的 calamine 引擎读取 Excel，未安装时回退到只读模式的 openpyxl
+try:
+    import python_calamine
+    EXCEL_READ_ENGINE = 'calamine'
+    EXCEL_READ_ENGINE_KWARGS = None
+except ImportError:
+    EXCEL_READ_ENGINE = 'openpyxl'
+    # read_only 流式读取单元格，data_only 读取公式的缓存值；下游只使用 DataFrame 结果
+    EXCEL_READ_ENGINE_KWARGS = {'read_only': True, 'data_only': True}
+
+def read_excel_sheets(path, sheet_names=None, dtypes=None):
+    """
+    读取 Excel 文件的 sheet。
+
+    Args:
+    - path (str): Excel 文件的路径。
+    - sheet_names (iterable, optional): 需要读取的 sheet 名，默认读取全部 sheet；文件中不存在的 sheet 会被忽略。
+    - dtypes (dict, optional): {sheet_name: {title: dtype}} 形式的类型提示，未列出的列由 pandas 推断类型。
+
+    Returns:
+    - sheets (dict): {sheet_name: DataFrame} 形式的字典。
+    """
+    # 只打开一次工作簿，逐个 sheet 解析，结束后关闭文件
+    with pd.ExcelFile(path, engine=EXCEL_READ_ENGINE,
+                      engine_kwargs=EXCEL_READ_ENGINE_KWARGS) as excel_file:
+        names = excel_file.sheet_names
+        if sheet_names is not None:
+            wanted = set(sheet_names)
+            names = [name for name in names if name in wanted]
+        dtypes = dtypes or {}
+        sheets = {name: excel_file.parse(name, dtype=dtypes.get(name)) for name in names}
+
+    return sheets
+
+def read_sheet_names(path):
+    """
+    读取 Excel 文件中全部 sheet 的名称，不解析单元格内容。
+
+    Args:
+    - path (str): Excel 文件的路径。
+
+    Returns:
+    - sheet_names (list): sheet 名称列表。
+    """
+    with pd.ExcelFile(path, engine=EXCEL_READ_ENGINE,
+                      engine_kwargs=EXCEL_READ_ENGINE_KWARGS) as excel_file:
+        return list(excel_file.sheet_names)
+
+def disk_cache(func):
+    """
+    将以 Excel 路径为第一个参数的函数结果缓存到磁盘。
+
+    缓存键由缓存版本、读取引擎、函数名、文件路径、修改时间、文件大小和其余参数组成，文件变化后缓存自动失效。
+    缓存文件先写入临时文件再原子替换；读取失败时视为未命中并重新解析，写入失败时直接返回结果。
+
+    Args:
+    - func (callable): 需要缓存的函数。
+
+    Returns:
+    - wrapper (callable): 带磁盘缓存的函数。
+    """
+    @functools.wraps(func)
+    def wrapper(path, *args, **kwargs):
+        key = (f"{CACHE_VERSION}-{EXCEL_READ_ENGINE}-{func.__name__}-{os.path.abspath(path)}"
+               f"-{os.path.getmtime(path)}-{os.path.getsize(path)}-{args!r}-{sorted(kwargs.items())!r}")
+        cache_path = os.path.join(CACHE_DIR, f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.pkl")
+
+        try:
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            # 缓存不存在、文件损坏或无法反序列化时均视为未命中
+            pass
+
+        result = func(path, *args, **kwargs)
+
+        tmp_path = None
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except BaseException as exc:
+            # 清理未完成的临时文件；缓存写入失败不影响已经得到的结果，只有中断等异常继续抛出
+            if tmp_path is not None:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+            # 无法序列化的对象可能抛出 PicklingError、AttributeError 或 TypeError，均按写入失败处理
+            if not isinstance(exc, Exception):
+                raise
+
+        return result
+
+    return wrapper
+
+def read_config_rows(config_path):
+    """
+    读取配置文件每个 sheet 的表头和数据行。
+
+    安装了 python-calamine 时直接读取原始行，跳过 DataFrame 的构造和类型推断；否则回退到 pandas。
+
+    Args:
+    - config_path (str): 配置文件（Excel）的路径。
+
+    Returns:
+    - config_rows (dict): {sheet_name: (header, rows)} 形式的字典，header 为列名列表，rows 为元组列表，空单元格为 None。
+      LeftTitle、RightTitle、TransType 列的空白已去除。
+    """
+    config_rows = {}
+
+    if EXCEL_READ_ENGINE == 'calamine':
+        workbook = python_calamine.CalamineWorkbook.from_path(config_path)
+        for sheet_name in workbook.sheet_names:
+            # 与 pandas 一致，保留开头的空行和空列，使 row[3:] 的列位置在两个分支中相同
+            rows = workbook.get_sheet_by_name(sheet_name).to_python(skip_empty_area=False)
+            header = list(rows[0]) if rows else []
+            key_indexes = [header.index(column) for column in CONFIG_KEY_COLUMNS if column in header]
+            # calamine 用空字符串表示空单元格，统一转换为 None，并跳过整行为空的行；
+            # 与 pandas 分支一致，只去除关键列的空白
+            data = []
+            for row in rows[1:]:
+                cells = [None if cell == '' else cell for cell in row]
+                if all(cell is None for cell in cells):
+                    continue
+                for index in key_indexes:
+                    if isinstance(cells[index], str):
+                        cells[index] = cells[index].strip()
+                data.append(tuple(cells))
+            config_rows[sheet_name] = (header, data)
+    else:
+        for sheet_name, df in read_excel_sheets(config_path).items():
+            # 与 calamine 分支一致，跳过整行为空的行
+            df = df.dropna(how='all')
+            # 空 sheet 没有表头或数据行，直接记为空
+            if df.empty:
+                config_rows[sheet_name] = (df.columns.tolist(), [])
+                continue
+            # 按列批量去除空白，代替逐行调用 strip；非字符串单元格变为 NaN，由 generate_nested_mapping 拒绝
+            for column in CONFIG_KEY_COLUMNS:
+                df[column] = df[column].astype(object).str.strip()
+            # 使用 itertuples 代替 iterrows，避免每行构造 Series
+            config_rows[sheet_name] = (df.columns.tolist(), list(df.itertuples(index=False, name=None)))
+
+    return config_rows
+
+@disk_cache
 def generate_nested_mapping(config_path):
     """
     从 config.xlsx 生成嵌套字典结构，并处理元素映射。
@@ -15,7 +179,8 @@ def generate_nested_mapping(config_path):
                   'rule': trans_type,
                   'elements': [
                       (source_element, target_element)
-                  ]
+                  ],
+                  'elements_dict': {source_element: target_element}
               }
           }
       }
@@ -23,9 +188,9 @@ def generate_nested_mapping(config_path):
     nested_mapping = {}
 
     # 读取配置文件的所有sheet
-    config_df = pd.read_excel(config_path, sheet_name=None)
+    config_rows = read_config_rows(config_path)
 
-    for sheet_name, df in config_df.items():
+    for sheet_name, (columns, rows) in config_rows.items():
         # 获取每个sheet对应的source和target sheet名
         left_sheet, right_sheet = sheet_name.split('-')
         left_sheet = left_sheet.strip()
@@ -34,10 +199,22 @@ def generate_nested_mapping(config_path):
         if (left_sheet, right_sheet) not in nested_mapping:
             nested_mapping[(left_sheet, right_sheet)] = {}
 
-        for _, row in df.iterrows():
-            left_title = row['LeftTitle'].strip()
-            right_title = row['RightTitle'].strip()
-            trans_type = row['TransType'].strip()
+        # 空 sheet 没有表头或数据行，只保留 sheet 映射
+        if not columns or not rows:
+            continue
+
+        left_idx = columns.index('LeftTitle')
+        right_idx = columns.index('RightTitle')
+        type_idx = columns.index('TransType')
+
+        for row in rows:
+            left_title = row[left_idx]
+            right_title = row[right_idx]
+            trans_type = row[type_idx]
+
+            # 三个关键列必须是非空字符串，避免以空值作为映射的键
+            if not all(isinstance(value, str) and value for value in (left_title, right_title, trans_type)):
+                raise ValueError(f"配置行缺少 LeftTitle、RightTitle 或 TransType: {sheet_name} -> {row}")
 
             if (left_title, right_title) not in nested_mapping[(left_sheet, right_sheet)]:
                 nested_mapping[(left_sheet, right_sheet)][(left_title, right_title)] = {
@@ -48,10 +225,24 @@ def generate_nested_mapping(config_path):
             # 处理TransType后的元素映射，存储为元组列表
             elements_mapping = nested_mapping[(left_sheet, right_sheet)][(left_title, right_title)]['elements']
             if trans_type == 'Translate':
-                for element_pair in row[3:]:  # 从第四列开始处理映射关系
-                    if pd.notna(element_pair):
-                        left_element, right_element = element_pair.split('-')
-                        elements_mapping.append((left_element.strip(), right_element.strip()))
+                # 从第四列开始处理映射关系，使用 str 访问器批量拆分和去除空白
+                element_pairs = pd.Series(row[3:], dtype=object).dropna()
+                if not element_pairs.empty:
+                    # 每个单元格必须是恰好包含一个 '-' 的字符串；数字、日期等非字符串单元格按空字符串计数，同样视为无效
+                    is_str = element_pairs.map(lambda value: isinstance(value, str)).astype(bool)
+                    invalid = element_pairs.where(is_str, '').str.count('-') != 1
+                    if invalid.any():
+                        raise ValueError(f"无法解析的元素映射: {element_pairs[invalid].tolist()}")
+                    parts = element_pairs.str.split('-', n=1, expand=True)
+                    left_elements = parts[0].str.strip().tolist()
+                    right_elements = parts[1].str.strip().tolist()
+                    # 每行一次性扩展，避免逐个 append
+                    elements_mapping.extend(zip(left_elements, right_elements))
+
+    # 预先生成元素映射字典，避免每次映射时重复构造
+    for titles_mapping in nested_mapping.values():
+        for mapping_info in titles_mapping.values():
+            mapping_info['elements_dict'] = dict(mapping_info['elements'])
 
     return nested_mapping
 
@@ -71,108 +262,172 @@ def reverse_nested_mapping(nested_mapping):
         reversed_mapping[(target_sheet, source_sheet)] = {}
 
         for (source_title, target_title), mapping_info in titles_mapping.items():
+            # 一次性拆分出两侧元素，再用 zip 重新组合，避免逐个构造元组
+            elements = mapping_info['elements']
+            sources, targets = zip(*elements) if elements else ((), ())
             reversed_mapping[(target_sheet, source_sheet)][(target_title, source_title)] = {
                 'rule': mapping_info['rule'],
-                'elements': [(target, source) for source, target in mapping_info['elements']]
+                'elements': list(zip(targets, sources)),
+                'elements_dict': dict(zip(targets, sources))
             }
 
     return reversed_mapping
 
-def read_source_data(source_path):
+@disk_cache
+def read_source_data(source_path, sheet_names=None, text_titles=None):
     """
     从 source.xlsx 读取数据并生成字典结构。
 
     Args:
     - source_path (str): 源文件（Excel）的路径。
+    - sheet_names (list, optional): 需要读取的 sheet 名，默认读取全部 sheet。
+    - text_titles (dict, optional): {sheet_name: [title, ...]}，这些列按字符串读取，通常是 Translate 规则的列。
 
     Returns:
-    - source_data (dict): 一个嵌套的字典结构，格式为：
+    - source_data (dict): 一个字典结构，格式为：
       {
-          sheet_name: {
-              title_name: [element1, element2, ..., elementN]
-          }
+          sheet_name: DataFrame
       }
+      每列只有在 generate_new_data 中匹配到映射后才会被取出处理。
     """
-    source_data = {}
+    # 读取源文件的sheet，直接返回原始 DataFrame；Translate 列按字符串读取，数字单元格可以匹配字符串形式的映射键，
+    # 其余列保留原始类型，Copy 规则原样写回数字和日期
+    dtypes = {sheet_name: {title: str for title in titles} for sheet_name, titles in (text_titles or {}).items()}
+    source_data = read_excel_sheets(source_path, sheet_names, dtypes)
 
-    # 读取源文件的所有sheet
-    source_df_dict = pd.read_excel(source_path, sheet_name=None)
+    return source_data
 
-    for sheet_name, df in source_df_dict.items():
-        source_data[sheet_name] = {}
+def flatten_nested_mapping(nested_mapping):
+    """
+    将嵌套映射字典展开为以源名称为键的索引，查找时只需对字符串做一次哈希。
 
-        for title in df.columns:
-            # 获取列中的所有元素，将NaN替换为None
-            elements = df[title].fillna('null').tolist()
-            source_data[sheet_name][title] = elements
+    Args:
+    - nested_mapping (dict): 嵌套映射字典。
 
-    return source_data
+    Returns:
+    - flat_mapping (dict): 展开后的索引，格式为：
+      {
+          source_sheet: (target_sheet, {
+              source_title: (target_title, rule, elements_dict)
+          })
+      }
+      同一源名称对应多个目标时保留第一个匹配项。
+    """
+    flat_mapping = {}
+
+    for (source_sheet, target_sheet), titles_mapping in nested_mapping.items():
+        if source_sheet in flat_mapping:
+            continue
+
+        title_index = {}
+        for (source_title, target_title), mapping_info in titles_mapping.items():
+            title_index.setdefault(source_title, (target_title, mapping_info['rule'], mapping_info['elements_dict']))
+
+        flat_mapping[source_sheet] = (target_sheet, title_index)
 
-def find_unmapped_data(source_data, nested_mapping):
+    return flat_mapping
+
+def find_unmapped_data(source_data, nested_mapping, flat_mapping=None, sheet_names=None):
     """
     识别 source_data 中无法找到映射的部分，并打印其路径。
 
     Args:
     - source_data (dict): 源数据字典。
     - nested_mapping (dict): 嵌套映射字典。
+    - flat_mapping (dict, optional): flatten_nested_mapping 生成的索引，传入时不再重复构造。
+    - sheet_names (list, optional): 源文件中全部 sheet 的名称；只读取了部分 sheet 时传入，用于报告未读取的未映射 sheet。
 
     Returns:
     - None
     """
-    for sheet_name, titles in source_data.items():
+    if flat_mapping is None:
+        flat_mapping = flatten_nested_mapping(nested_mapping)
+
+    if sheet_names is None:
+        sheet_names = list(source_data)
+
+    for sheet_name in sheet_names:
         # 查找匹配的 sheet
-        matched_sheet = None
-        for (source_sheet, target_sheet) in nested_mapping.keys():
-            if sheet_name == source_sheet:
-                matched_sheet = (source_sheet, target_sheet)
-                break
+        matched_sheet = flat_mapping.get(sheet_name)
 
         if not matched_sheet:
             print(f"未找到映射的 Sheet: {sheet_name}")
             continue
 
-        for title, elements in titles.items():
-            # 查找匹配的 title
-            matched_title = None
-            for (source_title, target_title) in nested_mapping[matched_sheet].keys():
-                if title == source_title:
-                    matched_title = (source_title, target_title)
-                    break
+        df = source_data.get(sheet_name)
+        if df is None:
+            continue
 
-            if not matched_title:
+        _, title_index = matched_sheet
+
+        for title in df.columns:
+            # 查找匹配的 title
+            if title not in title_index:
                 print(f"未找到映射的 Title: {sheet_name} -> {title}")
-                continue
 
-def map_elements_by_rule(elements, rule, element_mapping):
+def map_elements_by_rule(elements, rule, mapping_dict):
     """
     根据不同的映射规则处理元素，并生成新的元素列表。
 
     Args:
-    - elements (list): 需要映射的源元素列表。
+    - elements (Series): 需要映射的源元素列。
     - rule (str): 映射规则。
-    - element_mapping (list of tuples): 映射关系，格式为 [(source_element, target_element), ...]
+    - mapping_dict (dict): 映射关系，格式为 {source_element: target_element, ...}
 
     Returns:
-    - mapped_elements (list): 映射后的目标元素列表。
+    - mapped_elements (Series or list): 映射后的目标元素；Copy 规则直接返回 Series，不再转换为列表。
     """
     if rule == 'Copy':
-        # 直接复制元素
-        return elements
+        # 直接复制元素，保留 Series 交给 DataFrame 构造
+        return elements.fillna('null')
     elif rule == 'Translate':
-        # 使用映射关系翻译元素
-        mapping_dict = dict(element_mapping)
-        return [mapping_dict.get(elem, 'null') for elem in elements]
+        # 先将元素编码为整数，只对去重后的元素查找映射，再按编码取回结果；
+        # 空值的编码为 -1，正好取到末尾追加的 'null'，未找到映射的元素同样记为 'null'
+        # 映射表的键是字符串，只在这里把元素转换为 StringDtype，空值保留为 pd.NA
+        codes, uniques = pd.factorize(elements.astype('string'))
+        mapped_uniques = np.array([mapping_dict.get(elem, 'null') for elem in uniques] + ['null'], dtype=object)
+        return mapped_uniques[codes].tolist()
     else:
         # 可以在这里添加更多的映射规则
         raise ValueError(f"未知的映射规则: {rule}")
 
-def generate_new_data(source_data, nested_mapping):
+def process_sheet(df, target_sheet, title_index):
+    """
+    根据单个 sheet 的映射关系生成目标 sheet 的数据。
+
+    Args:
+    - df (DataFrame): 源 sheet 的数据。
+    - target_sheet (str): 目标 sheet 名。
+    - title_index (dict): 该 sheet 下的 {source_title: (target_title, rule, elements_dict)} 索引。
+
+    Returns:
+    - (target_sheet, mapped_titles) (tuple): 目标 sheet 名和 {target_title: mapped_elements} 字典。
+    """
+    mapped_titles = {}
+
+    for title in df.columns:
+        # 查找匹配的 title
+        matched_title = title_index.get(title)
+
+        if not matched_title:
+            continue
+
+        # 只有匹配到映射的列才取出处理，未匹配的列不产生额外开销
+        target_title, rule, mapping_dict = matched_title
+
+        # 根据不同的映射规则生成目标元素列表
+        mapped_titles[target_title] = map_elements_by_rule(df[title], rule, mapping_dict)
+
+    return target_sheet, mapped_titles
+
+def generate_new_data(source_data, nested_mapping, flat_mapping=None):
     """
     根据映射关系生成新的数据字典。
 
     Args:
     - source_data (dict): 源数据字典。
     - nested_mapping (dict): 嵌套映射字典。
+    - flat_mapping (dict, optional): flatten_nested_mapping 生成的索引，传入时不再重复构造。
 
     Returns:
     - new_data (dict): 生成的目标数据字典，格式为：
@@ -181,40 +436,30 @@ def generate_new_data(source_data, nested_mapping):
               target_title: [mapped_element1, mapped_element2, ..., mapped_elementN]
           }
       }
+      Copy 规则的列以 Series 形式保存。
     """
     new_data = {}
 
-    for sheet_name, titles in source_data.items():
-        # 查找匹配的 sheet
-        matched_sheet = None
-        for (source_sheet, target_sheet) in nested_mapping.keys():
-            if sheet_name == source_sheet:
-                matched_sheet = (source_sheet, target_sheet)
-                break
-
-        if not matched_sheet:
-            continue
-
-        if target_sheet not in new_data:
-            new_data[target_sheet] = {}
+    if flat_mapping is None:
+        flat_mapping = flatten_nested_mapping(nested_mapping)
 
-        for title, elements in titles.items():
-            # 查找匹配的 title
-            matched_title = None
-            for (source_title, target_title) in nested_mapping[matched_sheet].keys():
-                if title == source_title:
-                    matched_title = (source_title, target_title)
-                    break
+    # 每个 sheet 的映射主要在 pandas 的 C 代码中完成，使用线程池并行处理各个 sheet
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = []
+        for sheet_name, df in source_data.items():
+            # 查找匹配的 sheet
+            matched_sheet = flat_mapping.get(sheet_name)
 
-            if not matched_title:
+            if not matched_sheet:
                 continue
 
-            # 根据不同的映射规则生成目标元素列表
-            rule = nested_mapping[matched_sheet][matched_title]['rule']
-            element_mapping = nested_mapping[matched_sheet][matched_title]['elements']
-            mapped_elements = map_elements_by_rule(elements, rule, element_mapping)
+            target_sheet, title_index = matched_sheet
+            futures.append(executor.submit(process_sheet, df, target_sheet, title_index))
 
-            new_data[target_sheet][target_title] = mapped_elements
+        # 按提交顺序合并结果，保持输出顺序稳定
+        for future in futures:
+            target_sheet, mapped_titles = future.result()
+            new_data.setdefault(target_sheet, {}).update(mapped_titles)
 
     return new_data
 
@@ -229,9 +474,12 @@ def save_to_excel(new_data, target_path):
     Returns:
     - None
     """
-    with pd.ExcelWriter(target_path, engine='openpyxl') as writer:
+    # 使用 xlsxwriter 写入；to_excel 按列写入单元格，因此不能开启 constant_memory
+    writer_options = {'strings_to_urls': False}
+    with pd.ExcelWriter(target_path, engine='xlsxwriter',
+                        engine_kwargs={'options': writer_options}) as writer:
         for sheet_name, titles in new_data.items():
-            # 创建一个 DataFrame 用于存储该 sheet 的数据
+            # 创建一个 DataFrame 用于存储该 sheet 的数据，逐个 sheet 构造以控制内存峰值
             df = pd.DataFrame(titles)
             # 将 DataFrame 写入 Excel 文件中的相应 sheet
             df.to_excel(writer, sheet_name=sheet_name, index=False)
@@ -262,17 +510,27 @@ def main():
     #--------------------------------------读取原表格部分开发
     source_path = 'target.xlsx'  # 源文件路径
 
+    # 只构造一次映射索引，供下面的步骤共用
+    flat_mapping = flatten_nested_mapping(nested_mapping)
+
+    # 只读取映射中涉及的 sheet，Translate 规则的列按字符串读取
+    needed_sheets = sorted(flat_mapping)
+    text_titles = {
+        source_sheet: sorted(title for title, (_, rule, _) in title_index.items() if rule == 'Translate')
+        for source_sheet, (_, title_index) in flat_mapping.items()
+    }
+
     # 读取源文件的数据
-    source_data = read_source_data(source_path)
+    source_data = read_source_data(source_path, needed_sheets, text_titles)
 
     # 打印结果
     print("源文件结构和内容",source_data)
 
-    # 识别并打印未映射的部分
-    find_unmapped_data(source_data, nested_mapping)
+    # 识别并打印未映射的部分；未读取的 sheet 通过 sheet 名称列表报告
+    find_unmapped_data(source_data, nested_mapping, flat_mapping, read_sheet_names(source_path))
 
     # 根据映射关系生成新的数据字典
-    new_data = generate_new_data(source_data, nested_mapping)
+    new_data = generate_new_data(source_data, nested_mapping, flat_mapping)
 
     # 打印生成的目标数据字典
     print("生成的目标数据字典：", new_data)